@@ -35,6 +35,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import sys
+import random
 import argparse
 
 from hpo_similarity.load_files import load_participants_hpo_terms, load_genes
@@ -42,6 +43,16 @@ from hpo_similarity.ontology import open_ontology
 from hpo_similarity.permute_probands import permute_probands
 from hpo_similarity.analyse_genes import analyse_genes
 
+def positive_int(value):
+    """ convert a command line value to an integer of at least 1
+    """
+    
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError("{0} is less than 1".format(value))
+    
+    return value
+
 def get_options():
     """ get the command line switches
     """
@@ -57,6 +68,11 @@ def get_options():
     parser.add_argument("--ontology", \
         help="Optional path to HPO ontology obo file, see http://human-phenotype-ontology.org. " \
               "By default, this uses the hpo file stored in hpo_similarity/data/hpo.obo")
+    parser.add_argument("--ontology-cache", \
+        help="Optional folder to cache the parsed ontology in, so that later \
+            runs can skip parsing the ontology file. Loading the cache can run \
+            code from files in this folder, so only use a trusted folder \
+            which other users can't write to.")
     parser.add_argument("--output", default=sys.stdout, \
         help="path to output file, defaults to standard out.")
     parser.add_argument("--permute", action="store_true", default=False,
@@ -65,39 +81,48 @@ def get_options():
     parser.add_argument("--iterations", type=int, default=100000,
         help="whether to permute the probands across genes, in order to assess \
             method robustness.")
+    parser.add_argument("--processes", type=int, default=1,
+        help="number of processes to analyse genes with (default=1).")
+    parser.add_argument("--seed", type=int,
+        help="optional seed for the random sampling, to make P values reproducible.")
+    
+    # simulations shared between genes are run in full once per group size, so
+    # they can't stop early for each gene
+    nulls = parser.add_mutually_exclusive_group()
+    nulls.add_argument("--share-null", default=False, action="store_true",
+        help="share simulated scores between genes with the same number of \
+            probands. This is much faster, but the P values for those genes \
+            are then not independent. Can't be used with --stop-after.")
+    nulls.add_argument("--stop-after", type=positive_int,
+        help="optional number (1 or more) of simulated scores at least as \
+            high as the observed score, after which we stop simulating a \
+            gene. This is faster for genes which are clearly not \
+            significant. Can't be used with --share-null.")
     parser.add_argument("--use-alt-id-if-hpo-term-obsolete", default=False, action="store_true",
         help="map HPO terms to the standard id even if the term is labeled obsolete.")
 
     
-    # allow for using different similarity scoring metrics
+    # allow for using different similarity scoring metrics. These all set the
+    # same destination, so the chosen metric is held in a single option.
     group = parser.add_mutually_exclusive_group()
-    group.add_argument("--resnik", default="False", action="store_true",
-        help="whether to use Resnik's measure of similarity (the default).")
-    group.add_argument("--simgic", "--simGIC", default="False", action="store_true",
+    group.add_argument("--resnik", dest="score_type", action="store_const",
+        const="resnik", help="whether to use Resnik's measure of similarity (the default).")
+    group.add_argument("--simgic", "--simGIC", dest="score_type",
+        action="store_const", const="simGIC",
         help="whether to use simGIC measure of similarity.")
-    group.add_argument("--lin", default="False", action="store_true",
-        help="whether to use Lin's measure of semantic similarity.")
-    
-    args = parser.parse_args()
-    
-    # figure out the score type
-    if args.resnik:
-        args.score_type = "resnik"
-    elif args.simgic:
-        args.score_type = "simGIC"
-    elif args.lin:
-        args.score_type = "lin"
-    else:
-        args.score_type = "resnik"
+    group.add_argument("--lin", dest="score_type", action="store_const",
+        const="lin", help="whether to use Lin's measure of semantic similarity.")
+    parser.set_defaults(score_type="resnik")
     
-    return args
+    return parser.parse_args()
 
 def main():
     
     options = get_options()
     
     # build a graph of HPO terms, so we can trace paths between terms
-    graph, alt_ids, obsolete = open_ontology(options.ontology)
+    graph, alt_ids, obsolete = open_ontology(options.ontology,
+        options.ontology_cache)
     
     # load HPO terms and probands for each gene
     print("loading HPO terms and probands by gene")
@@ -106,14 +131,19 @@ def main():
     probands_by_gene = load_genes(options.genes_path)
     
     if options.permute:
-        probands_by_gene = permute_probands(probands_by_gene)
+        # use a seeded generator if given a seed, so permuted runs are also
+        # reproducible
+        rng = random if options.seed is None else random.Random(options.seed)
+        probands_by_gene = permute_probands(probands_by_gene, rng)
     
     graph.tally_hpo_terms(hpo_by_proband)
     
     print("analysing similarity")
     try:
         analyse_genes(graph, hpo_by_proband, probands_by_gene, \
-            options.output, options.iterations, options.score_type)
+            options.output, options.iterations, options.score_type, \
+            options.processes, options.seed, options.share_null, \
+            options.stop_after)
     except KeyboardInterrupt:
         sys.exit("HPO similarity exited.")
 
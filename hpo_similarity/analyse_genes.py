@@ -19,10 +19,132 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import random
+from multiprocessing import Pool
+
 from hpo_similarity.check_proband_terms import check_terms_in_graph
 from hpo_similarity.test_similarity import test_similarity
 
-def analyse_genes(hpo_graph, hpo_by_proband, probands_by_gene, output_path, iterations, score_type):
+# inputs shared by every gene, set within each worker process
+_shared = None
+
+def _init_worker(shared):
+    """ store the inputs shared across genes within a worker process
+    """
+    
+    global _shared
+    _shared = shared
+    
+    # forked workers inherit the parent's random state, so without reseeding
+    # every worker would draw the same sequence of simulated probands
+    random.seed()
+
+def _analyse_gene(item):
+    """ test a (gene, probands) item, using the inputs shared by the worker
+    """
+    
+    return analyse_shared_gene(item, _shared)
+
+def analyse_shared_gene(item, shared):
+    """ test a (gene, probands) item, using the inputs shared by all genes
+    
+    Args:
+        item: tuple of gene name, and list of proband IDs with variants in
+            the gene.
+        shared: dictionary of inputs shared by all genes, see analyse_genes().
+    
+    Returns:
+        tuple of gene name and P value (or None, if the gene wasn't tested).
+    """
+    
+    gene, probands = item
+    hpo_by_proband = shared["hpo_by_proband"]
+    nulls = shared["nulls"]
+    
+    name = get_sampling_name(gene, probands, hpo_by_proband, nulls)
+    rng = get_gene_rng(name, shared["seed"])
+    
+    return gene, analyse_gene(probands, shared["hpo_graph"], hpo_by_proband,
+        shared["iterations"], shared["score_type"], pool=shared["pool"],
+        nulls=nulls, stop_after=shared["stop_after"], rng=rng)
+
+def get_gene_rng(gene, seed=None):
+    """ get the random number generator to sample probands for a gene with
+    
+    Each gene gets its own generator, seeded from the gene name, so results
+    are reproducible regardless of which process handles a gene, or the order
+    genes are analysed in.
+    
+    Args:
+        gene: gene name, or other name for the sampling (see
+            get_sampling_name()).
+        seed: integer seed for the run, or None to use the random module's
+            shared (unseeded) generator.
+    
+    Returns:
+        random.Random object, or the random module if no seed was given.
+    """
+    
+    if seed is None:
+        return random
+    
+    return random.Random("{0}\t{1}".format(seed, gene))
+
+def get_sampling_name(gene, probands, hpo_by_proband, nulls=None):
+    """ get the name to seed the sampling for a gene with
+    
+    When genes share simulations, the simulations for a number of probands
+    are run by whichever gene reaches them first. These are named by the
+    number of probands instead, so seeded runs give the same simulations no
+    matter which gene (or process) runs them.
+    
+    Args:
+        gene: gene name
+        probands: list of proband IDs with variants in the gene.
+        hpo_by_proband: dictionary of HPO terms per proband
+        nulls: dictionary of simulated scores shared across genes, or None
+            if each gene runs its own simulations.
+    
+    Returns:
+        name to pass to get_gene_rng()
+    """
+    
+    if nulls is None:
+        return gene
+    
+    size = sum(1 for x in probands if x in hpo_by_proband)
+    
+    return "null\t{0}".format(size)
+
+def analyse_gene(probands, hpo_graph, hpo_by_proband, iterations, score_type,
+        pool=None, nulls=None, stop_after=None, rng=random):
+    """ tests whether the probands for a single gene share HPO terms by chance
+    
+    Args:
+        probands: list of proband IDs with variants in the gene.
+        hpo_graph: ICSimilarity object for the HPO term graph.
+        hpo_by_proband: dictionary of HPO terms per proband
+        iterations: number of iterations to run.
+        score_type: type of similarity metric to use ["resnik", "lin", "simGIC"]
+        pool: list of HPO terms for every proband, to sample from.
+        nulls: optional dictionary of simulated scores to share across genes.
+        stop_after: optional number of simulated scores at least as high as
+            the observed score, after which we stop simulating.
+        rng: random number generator to sample probands with.
+    
+    Returns:
+        P value for the gene, or None if the gene has too few probands.
+    """
+    
+    if len(probands) < 2:
+        return None
+    
+    return test_similarity(hpo_graph, hpo_by_proband, probands, iterations,
+        score_type, pool, rng, nulls, stop_after)
+
+def analyse_genes(hpo_graph, hpo_by_proband, probands_by_gene, output_path,
+        iterations, score_type, processes=1, seed=None, share_null=False,
+        stop_after=None):
     """ tests genes to see if their probands share HPO terms more than by chance.
     
     Args:
@@ -34,28 +156,85 @@ def analyse_genes(hpo_graph, hpo_by_proband, probands_by_gene, output_path, iter
             in those genes.
         output_path: path to file to write the results to, or sys.stdout object.
         iterations: number of iterations to run.
+        score_type: type of similarity metric to use ["resnik", "lin", "simGIC"]
+        processes: number of processes to analyse genes with. Each gene is
+            independent, so genes are shared out across the processes.
+        seed: optional integer seed, to make the P values reproducible.
+        share_null: whether genes with the same number of probands should
+            share one set of simulations. This is much quicker when testing
+            many genes, but the P values for those genes are then drawn from
+            the same simulated distribution.
+        stop_after: optional number of simulated scores at least as high as
+            the observed score, after which we stop simulating a gene. This
+            can't be used when the simulations are shared.
     """
     
+    if share_null and stop_after is not None:
+        raise ValueError("can't stop simulations early when they are shared")
+    
+    if stop_after is not None and stop_after < 1:
+        raise ValueError("stop_after must be at least 1, not {0}".format(stop_after))
+    
     check_terms_in_graph(hpo_graph, hpo_by_proband)
     
+    genes = sorted(probands_by_gene.items())
+    
+    # every gene samples from the same probands, so only build the pool once
+    proband_terms = list(hpo_by_proband.values())
+    
+    # Find the ancestors of every proband's terms before analysing any genes.
+    # This also finds the IC for every term. These are then shared by all
+    # genes, and forked worker processes inherit them, rather than each
+    # worker building its own copies.
+    for terms in proband_terms:
+        hpo_graph.get_proband_mask(terms)
+    
+    # worker processes each get their own copy of this, and fill in the
+    # simulations for the group sizes they come across
+    nulls = {} if share_null else None
+    
+    shared = {"hpo_graph": hpo_graph, "hpo_by_proband": hpo_by_proband,
+        "iterations": iterations, "score_type": score_type,
+        "pool": proband_terms, "nulls": nulls, "stop_after": stop_after,
+        "seed": seed}
+    
     # Sometimes output_path is actually sys.stdout, other times it is a path.
+    # We use a large write buffer, so the output is written in a few chunks.
     try:
-        output = open(output_path, "w")
+        output = open(output_path, "w", buffering=1 << 20)
     except TypeError:
         output = output_path
     
-    output.write("hgnc\thpo_similarity_p_value\n")
-    
-    for gene in sorted(probands_by_gene):
-        probands = probands_by_gene[gene]
+    pool = None
+    try:
+        output.write("hgnc\thpo_similarity_p_value\n")
         
-        p_value = None
-        if len(probands) > 1:
-            p_value = test_similarity(hpo_graph, hpo_by_proband, probands, iterations, score_type)
+        if processes > 1:
+            # imap returns results in gene order, so the output is the same
+            # as for a single process. Genes are sent to workers in chunks, to
+            # cut the messaging overhead for the many genes which finish
+            # quickly, while keeping a few chunks per worker to balance the
+            # load.
+            chunksize = max(1, len(genes) // (processes * 4))
+            pool = Pool(processes, initializer=_init_worker, initargs=(shared, ))
+            results = pool.imap(_analyse_gene, genes, chunksize)
+        else:
+            results = ( analyse_shared_gene(item, shared) for item in genes )
         
-        if p_value is None:
-            continue
+        output.writelines( "{0}\t{1}\n".format(gene, p_value)
+            for gene, p_value in results if p_value is not None )
         
-        output.write("{0}\t{1}\n".format(gene, p_value))
-    
-    output.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        # stop the workers if a gene raised an error, so they don't run on
+        # until the interpreter exits
+        if pool is not None:
+            pool.terminate()
+        
+        # only close files we opened, rather than closing sys.stdout
+        if output is output_path:
+            output.flush()
+        else:
+            output.close()
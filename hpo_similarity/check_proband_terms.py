@@ -19,6 +19,8 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+from itertools import chain
+
 def check_terms_in_graph(graph, hpo_by_proband):
     ''' check that all of the proband terms occur in the HPO ontology graph
     
@@ -32,9 +34,17 @@ def check_terms_in_graph(graph, hpo_by_proband):
         ValueError if any term is not present in the ontology graph
     '''
     
+    # find any missing terms with a single set operation, so that we only
+    # need to check each proband's terms if something is missing
+    terms = set(chain.from_iterable(hpo_by_proband.values()))
+    missing = terms.difference(graph)
+    
+    if not missing:
+        return
+    
     for proband in hpo_by_proband:
         for term in hpo_by_proband[proband]:
-            if term not in graph:
+            if term in missing:
                 raise ValueError('{0} has a term ({1}) missing from the ontology. '
                     '{1} might be in a more recent ontology, see '
                     'http://human-phenotype-ontology.org. You can define '
@@ -28,6 +28,12 @@ def get_resnik_score(hpo_graph, proband_1, proband_2):
     the information content for the most informative common ancestor for each
     pair. We return the largest of these IC scores, known as the maxIC.
     
+    Every common ancestor of a pair of terms is shared by the ancestors of both
+    probands, so the maxIC is the most informative term in the intersection of
+    the probands' ancestors. This avoids looping through each pair of terms.
+    The ancestors are held as bitmasks ordered by IC, so the intersection is a
+    single bitwise AND, and the maxIC is the lowest set bit.
+    
     Reference:
         Resnik, J Artif Intell Res (1999), 11:95-130.
     
@@ -42,12 +48,36 @@ def get_resnik_score(hpo_graph, proband_1, proband_2):
         A score for how similar the terms are between the two probands.
     """
     
-    ic = []
-    for term_1 in proband_1:
-        for term_2 in proband_2:
-            ic.append(hpo_graph.get_most_informative_ic(term_1, term_2))
+    common = hpo_graph.get_proband_mask(proband_1) & \
+        hpo_graph.get_proband_mask(proband_2)
     
-    return max(ic)
+    return hpo_graph.get_mask_max_ic(common)
+
+def get_summed_resnik_score(hpo_graph, probands):
+    """ sum the Resnik scores for every pair of probands in a group
+    
+    This gives the same result as summing get_resnik_score() for each pair,
+    but looks up each proband's ancestors once, rather than once per pair.
+    
+    Args:
+        hpo_graph: ICSimilarity object for the HPO term graph, with
+            information on how many times each term has been used across all
+            probands.
+        probands: List of HPO terms found for each proband.
+    
+    Returns:
+        The summed Resnik score across the pairs of probands.
+    """
+    
+    masks = [ hpo_graph.get_proband_mask(x) for x in probands ]
+    
+    total = 0
+    for x in range(len(masks)):
+        mask = masks[x]
+        for y in range(x + 1, len(masks)):
+            total += hpo_graph.get_mask_max_ic(mask & masks[y])
+    
+    return total
 
 def get_lin_score(hpo_graph, proband_1, proband_2):
     """ Calculate the similarity in HPO terms between terms for two probands.
@@ -70,18 +100,29 @@ def get_lin_score(hpo_graph, proband_1, proband_2):
         A score for how similar the terms are between the two probands.
     """
     
+    # look up the ancestors and IC for the second proband's terms once, rather
+    # than for every term in the first proband
+    others = [ (hpo_graph.get_ancestor_mask(x),
+        hpo_graph.calculate_information_content(x)) for x in proband_2 ]
+    
     ic = []
     for term_1 in proband_1:
-        for term_2 in proband_2:
-            a = 2 * hpo_graph.get_most_informative_ic(term_1, term_2)
-            
-            b = hpo_graph.calculate_information_content(term_1)
-            c = hpo_graph.calculate_information_content(term_2)
+        ancestors = hpo_graph.get_ancestor_mask(term_1)
+        b = hpo_graph.calculate_information_content(term_1)
+        for mask, c in others:
+            a = 2 * hpo_graph.get_mask_max_ic(ancestors & mask)
             
             try:
-                ic.append(a/(b + c))
+                score = a/(b + c)
             except ZeroDivisionError:
-                ic.append(0)
+                score = 0
+            
+            # Lin scores can't exceed 1 (e.g. for identical terms), so we can
+            # stop once a pair of terms reaches that
+            if score >= 1:
+                return score
+            
+            ic.append(score)
     
     return max(ic)
 
@@ -108,22 +149,21 @@ def get_simGIC_score(hpo_graph, proband_1, proband_2):
     scores = []
     for term_1 in proband_1:
         for term_2 in proband_2:
-            graph_1 = hpo_graph.get_ancestors(term_1)
-            graph_2 = hpo_graph.get_ancestors(term_2)
+            score = hpo_graph.get_simgic(term_1, term_2)
             
-            intersect = graph_1 & graph_2
-            union = graph_1 | graph_2
+            # simGIC scores can't exceed 1, so stop once a pair of terms
+            # reaches that
+            if score >= 1:
+                return score
             
-            intersect = sum([ hpo_graph.calculate_information_content(x) for x in intersect ])
-            union = sum([ hpo_graph.calculate_information_content(x) for x in union ])
-            
-            try:
-                scores.append(intersect/union)
-            except ZeroDivisionError:
-                scores.append(1)
+            scores.append(score)
     
     return max(scores)
 
+# functions to calculate the proband pairwise scores with, for each score type
+SCORE_FUNCS = {"resnik": get_resnik_score, "simGIC": get_simGIC_score,
+    "lin": get_lin_score}
+
 def get_proband_similarity(hpo_graph, probands, score_type="resnik"):
     """ calculate the similarity of HPO terms across different individuals.
     
@@ -144,21 +184,37 @@ def get_proband_similarity(hpo_graph, probands, score_type="resnik"):
         The summed similarity score across the HPO terms for each proband.
     """
     
-    # pick the function to calculate the proband pairwise scores with
-    funcs = {"resnik": get_resnik_score, "simGIC": get_simGIC_score, \
-        "lin": get_lin_score}
-    get_score = funcs[score_type]
-    
-    ic_scores = []
-    for x in range(len(probands)):
-        for y in range(x, len(probands)):
-            # don't match a proband to itself
-            if x == y:
-                continue
-            
-            # for each term in the proband, measure how well it matches the
-            # terms in another proband
-            score = get_score(hpo_graph, probands[x], probands[y])
-            ic_scores.append(score)
+    # Resnik scores only need the ancestors of each proband, which are
+    # quicker to look up once per proband than once per pair
+    if score_type == "resnik":
+        return get_summed_resnik_score(hpo_graph, probands)
     
-    return sum(ic_scores)
+    # pick the function to calculate the proband pairwise scores with
+    get_score = SCORE_FUNCS[score_type]
+    
+    # Probands can have identical terms, e.g. a single common term. Score each
+    # distinct set of terms once, and weight the scores by how many pairs of
+    # probands have those terms.
+    distinct = {}
+    for terms in probands:
+        key = frozenset(terms)
+        if key not in distinct:
+            distinct[key] = [terms, 0]
+        distinct[key][1] += 1
+    distinct = list(distinct.values())
+    
+    total = 0
+    for x in range(len(distinct)):
+        terms_1, count_1 = distinct[x]
+        
+        # include the pairs of probands who share identical terms
+        if count_1 > 1:
+            pairs = count_1 * (count_1 - 1) // 2
+            total += get_score(hpo_graph, terms_1, terms_1) * pairs
+        
+        # start after the current terms, so we don't score the same pair twice
+        for y in range(x + 1, len(distinct)):
+            terms_2, count_2 = distinct[y]
+            total += get_score(hpo_graph, terms_1, terms_2) * count_1 * count_2
+    
+    return total
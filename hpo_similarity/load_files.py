@@ -20,6 +20,8 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import json
+from sys import intern
+from collections import OrderedDict
 
 def load_participants_hpo_terms(path, alt_ids, obsolete, use_alt_id_if_hpo_term_obsolete=False):
     """ loads patient HPO terms
@@ -32,28 +34,39 @@ def load_participants_hpo_terms(path, alt_ids, obsolete, use_alt_id_if_hpo_term_
     
     Returns:
         dictionary of HPO term lists indexed by proband ID e.g. {DDD01:
-        [HP:01, HP:02], DDD02: [HP:03, HP:03]}
+        [HP:01, HP:02], DDD02: [HP:03, HP:03]}. Probands left without any
+        terms (e.g. if all their terms were blank or obsolete) are excluded.
     """
     
     # load the phenotype data for each participant
     with open(path, "r") as handle:
         hpo = json.load(handle)
     
-    for proband in hpo:
-        terms = hpo[proband]
-        
-        # strip out the obsolete terms, currently there are two probands (out of
-        # >4000) who each have an obsolete term, so it's not worth converting the
-        # obsolete terms to a more appropriate term
-        if use_alt_id_if_hpo_term_obsolete:
-            obsolete -= set(alt_ids.keys())
-        terms = [term for term in terms if term not in obsolete]
+    # find the terms to drop once, rather than for every proband. This also
+    # avoids modifying the obsolete set that was passed in.
+    if use_alt_id_if_hpo_term_obsolete:
+        obsolete = obsolete - set(alt_ids)
+    
+    for proband in list(hpo):
+        # Strip out blank and obsolete terms. Currently there are two probands
+        # (out of >4000) who each have an obsolete term, so it's not worth
+        # converting the obsolete terms to a more appropriate term.
+        # Convert each remaining term to its standard HPO ID if the term is in
+        # the alt IDs, otherwise assume it is a standard HPO ID already.
+        # Interning the IDs means they are the same string objects as the
+        # ontology node IDs. This is all done in one pass over the terms.
+        terms = [ alt_ids[term] if term in alt_ids else intern(term)
+            for term in hpo[proband] if term and term not in obsolete ]
         
-        # convert each term to it's standard HPO ID if the term is in the HPO IDs,
-        # otherwise just assume it is a standard HPO ID already.
-        terms = [alt_ids[term] if term in alt_ids else term for term in terms]
+        # drop repeated terms (including alt IDs that map to the same term),
+        # which would otherwise be scored again in every pairwise comparison.
+        # This keeps the first occurrence of each term, in the original order.
+        hpo[proband] = list(OrderedDict.fromkeys(terms))
         
-        hpo[proband] = terms
+        # probands without any terms can't be compared to other probands, so
+        # leave them out, as we do for probands without phenotype data
+        if len(hpo[proband]) == 0:
+            del hpo[proband]
     
     return hpo
 
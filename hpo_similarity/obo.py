@@ -190,6 +190,7 @@ class Parser(object):
         
         self.fp = fp
         self.line_re = re.compile(r"\s*(?P<tag>[^:]+):\s*(?P<value>.*)")
+        self.string_re = re.compile(r'"(?P<value>[^"\\]*)"(?!")')
         self.lineno = 0
         self._read_headers()
 
@@ -247,6 +248,14 @@ class Parser(object):
         # If the value starts with a quotation mark, we parse it as a
         # Python string -- luckily this is the same as an OBO string
         if value_and_mod and value_and_mod[0] == '"':
+            # most strings lack escape sequences, so we can slice those out
+            # directly, rather than running the tokenizer and eval on them
+            string = self.string_re.match(value_and_mod)
+            if string is not None:
+                value = string.group("value")
+                mod = (value_and_mod[string.end():].strip(), )
+                return tag, Value(value, mod)
+
             g = tokenize.generate_tokens(StringIO(value_and_mod).readline)
             for toknum, tokval, _, (erow, ecol), _ in g:
                 if toknum == tokenize.STRING:
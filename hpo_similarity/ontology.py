@@ -24,11 +24,27 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+from sys import intern
+
 from pkg_resources import resource_filename
 
 from hpo_similarity.similarity import ICSimilarity
 from hpo_similarity.obo import Parser
 
+# version of the data layout in cached ontology files. Increment this if the
+# cached data changes, so older caches aren't used.
+CACHE_FORMAT = 1
+
+# the process umask, for giving cache files the permissions of normally created
+# files. This can only be read by setting it, so we read it once, on import.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
 def load_hpo_database(hpo_path):
     """ load the human phenotype ontology (HPO) database in obo format
     
@@ -50,6 +66,28 @@ def load_hpo_database(hpo_path):
     
     return parser.headers, hpo_entries
 
+def get_hpo_attributes(obo_tags):
+    """ get the attributes for a graph node from the tags of an obo entry
+    
+    Args:
+        obo_tags: tags for an obo entry
+        
+    Returns:
+        dictionary of attributes, with a list of values for tags which have
+        more than one value, otherwise a single value.
+    """
+    
+    # Value objects already hold their value as a string, so we can use it
+    # directly rather than converting each one with str()
+    attributes = {}
+    for key, values in obo_tags.items():
+        if len(values) > 1:
+            attributes[key] = [ot.value for ot in values]
+        else:
+            attributes[key] = values[0].value
+    
+    return attributes
+
 def add_hpo_attributes_to_node(graph, node_id, obo_tags):
     """ add hpo attributes to a graph node
     
@@ -62,11 +100,7 @@ def add_hpo_attributes_to_node(graph, node_id, obo_tags):
         nothing, updates the graph node within this function
     """
     
-    for key in obo_tags:
-        if len(obo_tags[key]) > 1:
-            graph.nodes[node_id][key] = [str(ot) for ot in obo_tags[key]]
-        else:
-            graph.nodes[node_id][key] = str(obo_tags[key][0])
+    graph.nodes[node_id].update(get_hpo_attributes(obo_tags))
 
 def is_obsolete(obo_tags):
     """ checks if an "is_obsolete" flag is in the tags for an obo entry
@@ -97,55 +131,205 @@ def track_alt_ids(alt_ids, obo_tags, node_id):
             alt_id = str(alt_id)
             alt_ids[alt_id] = node_id
 
-def add_entry(graph, entry, alt_ids, obsolete_ids):
-    """ add a node to the graph
+def add_entry(nodes, edges, entry, alt_ids, obsolete_ids):
+    """ collect the node and edges for an entry, to be added to the graph
+    
+    Adding nodes and edges one at a time is slow in networkx, so we gather
+    them into lists, which are added to the graph in bulk.
     
     Args:
-        graph: a networkx DiGraph
+        nodes: list of (node ID, attribute dictionary) tuples
+        edges: list of (predecessor ID, node ID) tuples
         entry: HPO ontology object, to be added to the graph
         alt_ids: dictionary of alt IDs mapping to correct IDs
         obsolete_ids: set of odsolete IDs
     """
     tags = entry.tags
+    
+    # intern the HPO IDs, so the same term from the ontology and from the
+    # phenotype files shares one string, and dict lookups match by identity
+    node_id = intern(tags["id"][0].value)
+    
     # ignore obsolete HPO entries
     if is_obsolete(tags):
-        obsolete_ids.add(str(tags["id"][0]))
+        obsolete_ids.add(node_id)
         return
     
-    node_id = str(tags["id"][0])
-    graph.add_node(node_id)
-    
     # make sure we can convert between HPO ID and their alternate IDs
     track_alt_ids(alt_ids, tags, node_id)
     
     # include the attribute data for the node
-    add_hpo_attributes_to_node(graph, node_id, tags)
+    nodes.append((node_id, get_hpo_attributes(tags)))
     
     # add the predecessors to the node
     if "is_a" in tags:
         for predecessor in tags["is_a"]:
-            predecessor = str(predecessor)
-            graph.add_edge(predecessor, node_id)
+            edges.append((intern(predecessor.value), node_id))
 
-def open_ontology(path=None):
-    """ builds a networkx graph from obo parsed data
+def get_cache_path(hpo_path, cache_dir):
+    """ get the path to the cached graph for an HPO obo file
+    
+    The cache name includes the obo file's path, size and modification time,
+    as well as the cache format, so edited or replaced obo files (or changes
+    to the cached data) don't reuse stale caches.
+    
+    Args:
+        hpo_path: path to HPO obo formatted file
+        cache_dir: folder to store cached graphs in
     
     Returns:
-        networkx graph object, alt IDs and obsolete IDs
+        path to the cache file for the obo file
     """
     
-    header, entries = load_hpo_database(path)
-    graph = ICSimilarity()
+    stat = os.stat(hpo_path)
+    key = "{0}\t{1}\t{2}\t{3}".format(os.path.abspath(hpo_path), stat.st_size,
+        stat.st_mtime, CACHE_FORMAT)
+    digest = hashlib.md5(key.encode("utf8")).hexdigest()
     
-    # track alternate HPO IDs (since we use HPO IDs as node IDs)
-    alt_ids = {}
-    obsolete_ids = set()
+    name = "{0}.{1}.pickle".format(os.path.basename(hpo_path), digest)
+    
+    return os.path.join(cache_dir, name)
+
+def build_graph(header, nodes, edges):
+    """ build the graph of HPO terms from the parsed obo data
+    
+    Args:
+        header: dictionary of obo header values
+        nodes: list of (node ID, attribute dictionary) tuples
+        edges: list of (predecessor ID, node ID) tuples
+    
+    Returns:
+        ICSimilarity graph object
+    """
+    
+    graph = ICSimilarity()
     
     # add the hpo header values as attributes for the graph
     for header_id in header:
         graph.graph[header_id] = header[header_id]
     
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(edges)
+    
+    return graph
+
+def parse_ontology(path):
+    """ parse the nodes and edges for the HPO graph from an obo file
+    
+    Args:
+        path: path to HPO obo formatted file
+    
+    Returns:
+        tuple of obo header, list of (node ID, attribute dictionary) tuples,
+        list of (predecessor ID, node ID) tuples, alt IDs and obsolete IDs
+    """
+    
+    header, entries = load_hpo_database(path)
+    
+    # track alternate HPO IDs (since we use HPO IDs as node IDs)
+    alt_ids = {}
+    obsolete_ids = set()
+    
+    nodes, edges = [], []
     for entry in entries:
-        add_entry(graph, entry, alt_ids, obsolete_ids)
+        add_entry(nodes, edges, entry, alt_ids, obsolete_ids)
+    
+    return header, nodes, edges, alt_ids, obsolete_ids
+
+def load_cache(cache_path):
+    """ load parsed obo data from a cache file
+    
+    Args:
+        cache_path: path to the cache file
+    
+    Returns:
+        tuple of parsed obo data (see parse_ontology()), or None if the cache
+        doesn't exist, or can't be read (e.g. if it was truncated, or written
+        by a newer python version).
+    """
+    
+    if not os.path.exists(cache_path):
+        return None
+    
+    try:
+        with open(cache_path, "rb") as handle:
+            header, nodes, edges, alt_ids, obsolete_ids = pickle.load(handle)
+    except (pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        return None
+    
+    # unpickled strings aren't interned, so intern the HPO IDs again, to
+    # match the IDs from the phenotype files
+    nodes = [ (intern(node), attrs) for node, attrs in nodes ]
+    edges = [ (intern(x), intern(y)) for x, y in edges ]
+    alt_ids = dict( (x, intern(y)) for x, y in alt_ids.items() )
+    obsolete_ids = set( intern(x) for x in obsolete_ids )
+    
+    return header, nodes, edges, alt_ids, obsolete_ids
+
+def write_cache(cache_path, data):
+    """ write parsed obo data to a cache file
+    
+    The cache only saves time on later runs, so if it can't be written, we
+    print a warning and carry on without it.
+    
+    Args:
+        cache_path: path to write the cache to
+        data: tuple of parsed obo data to cache
+    """
+    
+    cache_dir = os.path.dirname(cache_path)
+    
+    # write to a temporary file first, so that concurrent runs never read
+    # a partially written cache
+    handle = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        handle = tempfile.NamedTemporaryFile(dir=cache_dir, delete=False)
+        with handle:
+            pickle.dump(data, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        # temporary files are only readable by their owner, so give the cache
+        # the permissions of a normally created file
+        os.chmod(handle.name, 0o666 & ~UMASK)
+        os.replace(handle.name, cache_path)
+    except (OSError, pickle.PicklingError) as error:
+        if handle is not None and os.path.exists(handle.name):
+            os.remove(handle.name)
+        print("unable to cache the ontology at {0}: {1}".format(cache_path,
+            error), file=sys.stderr)
+
+def open_ontology(path=None, cache_dir=None):
+    """ builds a networkx graph from obo parsed data
+    
+    Args:
+        path: path to HPO obo formatted file, or None to use the default
+        cache_dir: optional folder to cache the parsed ontology in. Parsing
+            the obo file is slow, so later runs load the parsed data from the
+            cache. Only the parsed data is cached, rather than the graph
+            object, so caches don't depend on the graph class. Caches are
+            pickled, and loading a pickle can run arbitrary code, so only use
+            folders which untrusted users can't write to.
+    
+    Returns:
+        networkx graph object, alt IDs and obsolete IDs
+    """
+    
+    if path is None:
+        path = resource_filename(__name__, "data/hp.obo")
+    
+    data = None
+    if cache_dir is not None:
+        cache_path = get_cache_path(path, cache_dir)
+        data = load_cache(cache_path)
+    
+    # parse the obo file if we don't have a usable cache, and cache the
+    # parsed data (replacing any unreadable cache)
+    if data is None:
+        data = parse_ontology(path)
+        if cache_dir is not None:
+            write_cache(cache_path, data)
+    
+    header, nodes, edges, alt_ids, obsolete_ids = data
+    graph = build_graph(header, nodes, edges)
     
     return graph, alt_ids, obsolete_ids
@@ -21,7 +21,7 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import random
 
-def permute_probands(probands):
+def permute_probands(probands, rng=random):
     """ permute the probands by gene, so that every gene gets a random sample
     
     We occasionally want to permute the probands for each gene, so that each
@@ -33,22 +33,36 @@ def permute_probands(probands):
     Args:
         probands: dictionary of proband lists for each gene, for example
             {"ADNP": [DDD01, DDD02], "ANKRD1": ["DDD03", "DDD04"]}.
+        rng: random number generator to sample probands with. This defaults to
+            the random module, but a seeded random.Random object gives
+            reproducible permutations.
     
     Returns:
         dictionary where each gene now has randomly sampled probands.
     """
     
-    all_probands = probands.values()
-    all_probands = set.union(*[set(x) for x in all_probands])
+    # sort the probands, so that permutations with a given random seed are
+    # reproducible, and random.sample() has a sequence to draw from
+    all_probands = sorted(set.union(*[set(x) for x in probands.values()]))
     
     permuted = {}
     for gene in probands:
-        # get a set of probands, except without those probands who are in the
-        # current gene
-        excluding_gene = all_probands - set(probands[gene])
+        current = set(probands[gene])
+        size = len(probands[gene])
         
-        # randomly sample a new set of probands, as many as the current gene has
-        sample = random.sample(excluding_gene, len(probands[gene]))
-        permuted[gene] = sample
+        if len(all_probands) - len(current) < size:
+            raise ValueError("too few probands outside {0} to sample "
+                "from".format(gene))
+        
+        # randomly sample a new set of probands, as many as the current gene
+        # has, except without those probands who are in the current gene. We
+        # draw from all the probands, and redraw for those in the gene, which
+        # avoids building a new list of the other probands for every gene.
+        sample = []
+        while len(sample) < size:
+            sample += [ x for x in rng.sample(all_probands, size)
+                if x not in current and x not in sample ]
+        
+        permuted[gene] = sample[:size]
     
     return permuted
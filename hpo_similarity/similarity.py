@@ -25,7 +25,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import math
-from networkx import DiGraph
+from networkx import DiGraph, topological_sort
 
 from hpo_similarity.check_proband_terms import check_terms_in_graph
 
@@ -104,17 +104,27 @@ class CalculateSimilarity(DiGraph):
             set of descendant HPO terms
         """
         
-        if term not in self.descendant_cache:
-            terms = set(self.successors(term))
-            
-            # recursively extend up the graph until we hit the top node
-            extra = [ self.get_descendants(x) for x in terms ]
-            terms |= set([item for sublist in extra for item in sublist])
-            
-            self.descendant_cache[term] = terms
+        if term not in self.descendant_cache and term in self:
+            self.cache_descendants()
         
         return self.descendant_cache[term]
     
+    def cache_descendants(self):
+        """ find the descendants for every term in the graph in a single pass
+        
+        This mirrors cache_ancestors(), but visits the terms from the bottom of
+        the graph up, so each term's descendants are its child terms, plus the
+        descendants of those children.
+        """
+        
+        for term in reversed(list(topological_sort(self))):
+            descendants = set()
+            for child in self.successors(term):
+                descendants.add(child)
+                descendants |= self.descendant_cache[child]
+            
+            self.descendant_cache[term] = descendants
+    
     def get_ancestors(self, bottom_term):
         """ finds the set of subterms that are ancestors of a HPO term
         
@@ -130,18 +140,27 @@ class CalculateSimilarity(DiGraph):
             set of ancestor HPO terms
         """
         
-        if bottom_term not in self.ancestor_cache:
-            subterms = set(self.predecessors(bottom_term))
-            
-            # recursively extend down the graph until we hit the bottom nodes
-            extra = [ self.get_ancestors(x) for x in subterms ]
-            subterms |= set([item for sublist in extra for item in sublist])
-            
-            subterms.add(bottom_term)
-            self.ancestor_cache[bottom_term] = subterms
+        if bottom_term not in self.ancestor_cache and bottom_term in self:
+            self.cache_ancestors()
         
         return self.ancestor_cache[bottom_term]
     
+    def cache_ancestors(self):
+        """ find the ancestors for every term in the graph in a single pass
+        
+        The graph is static once loaded, so rather than walking up the graph
+        separately for each term, we visit the terms in topological order. Each
+        term's ancestors are then the union of its parents' ancestor sets,
+        which have already been found.
+        """
+        
+        for term in topological_sort(self):
+            ancestors = set([term])
+            for parent in self.predecessors(term):
+                ancestors |= self.ancestor_cache[parent]
+            
+            self.ancestor_cache[term] = ancestors
+    
     def find_common_ancestors(self, term_1, term_2):
         """ finds the common ancestors of two hpo terms
         
@@ -157,14 +176,25 @@ class CalculateSimilarity(DiGraph):
         if term_1 not in self or term_2 not in self:
             return set()
         
-        return set(self.get_ancestors(term_1)) & set(self.get_ancestors(term_2))
+        return self.get_ancestors(term_1) & self.get_ancestors(term_2)
 
 
 class ICSimilarity(CalculateSimilarity):
     """ calculate similarity by IC score
     """
     
-    most_informative = {}
+    def __init__(self):
+        self.ic_cache = {}
+        self.ancestor_ic_sums = {}
+        
+        # bit positions for each term, ordered by decreasing IC, along with
+        # ancestor sets encoded as integer bitmasks
+        self.term_bits = None
+        self.ic_by_bit = None
+        self.ancestor_masks = {}
+        self.proband_masks = {}
+        
+        super(ICSimilarity, self).__init__()
     
     def get_most_informative_ic(self, term_1, term_2):
         """ calculate the information content between two HPO terms using the most informative common ancestor
@@ -178,20 +208,64 @@ class ICSimilarity(CalculateSimilarity):
             term_1 and term_2.
         """
         
-        terms = (term_1, term_2)
+        # The ancestor masks are cached per term, and finding the MICA from
+        # those is quick. We don't cache each pair, as the number of distinct
+        # term pairs is large and few of them recur across simulations.
+        common = self.get_ancestor_mask(term_1) & self.get_ancestor_mask(term_2)
         
-        if terms not in self.most_informative:
-            
-            ancestors = self.find_common_ancestors(term_1, term_2)
-            ic_values = [self.calculate_information_content(x) for x in ancestors]
-            
-            # cache the most informative IC value, so we only compute this once
-            # per pair of HPO terms.
-            most_informative = max(ic_values)
-            self.most_informative[terms] = most_informative
-            self.most_informative[(term_2, term_1)] = most_informative
+        return self.get_mask_max_ic(common)
+    
+    def get_simgic(self, term_1, term_2):
+        """ calculate the simGIC score between two HPO terms
+        
+        This is the summed information content of the terms' common ancestors,
+        divided by the summed information content of all of their ancestors.
         
-        return self.most_informative[terms]
+        Args:
+            term_1: hpo term, eg HP:0000003
+            term_2: hpo term, eg HP:0000002
+        
+        Returns:
+            the simGIC score for term_1 and term_2.
+        """
+        
+        # identical terms are completely similar, so skip the rounding error
+        # from summing their ancestors in different orders
+        if term_1 == term_2:
+            return 1
+        
+        # We don't cache each pair, as few term pairs recur across simulations.
+        # Instead the summed IC of each term's ancestors is cached, so only
+        # the common ancestors need summing. The union is then the two sums,
+        # less the common ancestors, which would otherwise be counted twice.
+        union = self.get_ancestor_ic_sum(term_1) + self.get_ancestor_ic_sum(term_2)
+        
+        # the IC of every ancestor of term_1 was cached while summing them, so
+        # we can look up the common ancestors directly
+        common = self.get_ancestors(term_1) & self.get_ancestors(term_2)
+        intersect = sum(map(self.ic_cache.__getitem__, common))
+        union -= intersect
+        
+        try:
+            return intersect/union
+        except ZeroDivisionError:
+            return 1
+    
+    def get_ancestor_ic_sum(self, term):
+        """ get the summed information content of a term's ancestors
+        
+        Args:
+            term: hpo term, eg "HP:0000001"
+        
+        Returns:
+            the summed information content for the term and its ancestors.
+        """
+        
+        if term not in self.ancestor_ic_sums:
+            self.ancestor_ic_sums[term] = sum(map(
+                self.calculate_information_content, self.get_ancestors(term)))
+        
+        return self.ancestor_ic_sums[term]
     
     def calculate_information_content(self, term):
         """ calculates the information content for an hpo term
@@ -206,16 +280,131 @@ class ICSimilarity(CalculateSimilarity):
             the information content value for a single hpo term
         """
         
-        if term not in self:
-            return 0
-        
-        if 'info_content' not in self.nodes[term]:
+        if term not in self.ic_cache:
+            if term not in self:
+                return 0
+            
             term_count = self.get_term_count(term)
             
-            # cache the IC, so we don't have to recalculate for the term
-            self.nodes[term]['info_content'] = -math.log(term_count/self.total_freq)
+            # cache the IC, so we don't have to recalculate for the term. This
+            # is a plain dict, as lookups via the networkx node view are slow.
+            self.ic_cache[term] = -math.log(term_count/self.total_freq)
+        
+        return self.ic_cache[term]
+    
+    def index_terms(self):
+        """ assign each term in the graph a bit position, ordered by decreasing IC
+        
+        Sets of terms can then be held as integer bitmasks. As the most
+        informative terms have the lowest bits, the most informative term in a
+        set is the lowest set bit of its mask.
+        
+        The IC falls as the term count rises, so we order by the term count.
+        Terms unused by any proband have no IC, and go last. These can't be
+        ancestors of used terms, so are never picked over a used term.
+        """
+        
+        self.cache_information_content()
+        counts = dict((x, self.get_term_count(x)) for x in self)
+        terms = sorted(self, key=lambda x: (counts[x] == 0, counts[x]))
+        
+        self.term_bits = dict((term, i) for i, term in enumerate(terms))
+        self.ic_by_bit = [ self.ic_cache.get(x) for x in terms ]
+    
+    def get_ancestor_mask(self, term):
+        """ get the ancestors of a HPO term as an integer bitmask
+        
+        Args:
+            term: hpo term, eg "HP:0000001"
+        
+        Returns:
+            integer with a bit set for each ancestor of the term (including the
+            term itself).
+        """
+        
+        if term not in self.ancestor_masks:
+            if self.term_bits is None:
+                self.index_terms()
+            
+            mask = 0
+            for ancestor in self.get_ancestors(term):
+                mask |= 1 << self.term_bits[ancestor]
+            
+            self.ancestor_masks[term] = mask
+        
+        return self.ancestor_masks[term]
+    
+    def get_proband_mask(self, terms):
+        """ get the ancestors of any of a proband's terms as an integer bitmask
+        
+        Args:
+            terms: list of hpo terms for a proband
+        
+        Returns:
+            integer with a bit set for each term which is an ancestor of (or
+            is) one of the proband's terms.
+        """
+        
+        key = frozenset(terms)
+        if key not in self.proband_masks:
+            mask = 0
+            for term in key:
+                mask |= self.get_ancestor_mask(term)
+            
+            self.proband_masks[key] = mask
+        
+        return self.proband_masks[key]
+    
+    def get_mask_max_ic(self, mask):
+        """ find the largest information content among terms in a bitmask
         
-        return self.nodes[term]['info_content']
+        Args:
+            mask: integer bitmask of hpo terms, from get_ancestor_mask() or
+                get_proband_mask().
+        
+        Returns:
+            the largest information content from the terms
+        
+        Raises:
+            ValueError if the mask is empty, or its terms have no information
+            content, as no proband used them.
+        """
+        
+        if mask == 0:
+            raise ValueError("no terms in bitmask")
+        
+        # isolate the lowest set bit, which is the most informative term
+        ic = self.ic_by_bit[(mask & -mask).bit_length() - 1]
+        
+        # terms which no proband used (or any term, if the terms haven't been
+        # tallied yet) have no information content
+        if ic is None:
+            raise ValueError("no information content for terms in bitmask, "
+                "have the HPO terms been tallied?")
+        
+        return ic
+    
+    def cache_information_content(self):
+        """ find the term counts and information content for every term at once
+        
+        Rather than gathering the probands for each term from all of its
+        descendants separately, we visit terms from the bottom of the graph up.
+        The probands for a term are then its own probands, plus those of its
+        child terms, which have already been found.
+        """
+        
+        sample_ids = {}
+        for term in reversed(list(topological_sort(self))):
+            ids = set(self.get_ids_per_term(term))
+            for child in self.successors(term):
+                ids |= sample_ids[child]
+            
+            sample_ids[term] = ids
+            
+            count = len(ids)
+            self.nodes[term]['count'] = count
+            if count > 0:
+                self.ic_cache[term] = -math.log(count/self.total_freq)
     
     def get_term_count(self, term):
         """ Count how many times a term (or its subterms) was used.
@@ -231,7 +420,8 @@ class ICSimilarity(CalculateSimilarity):
             return 0
         
         if 'count' not in self.nodes[term]:
-            sample_ids = self.get_ids_per_term(term)
+            # copy the term's sample IDs, so the node's own set isn't extended
+            sample_ids = set(self.get_ids_per_term(term))
             for subterm in self.get_descendants(term):
                 sample_ids |= self.get_ids_per_term(subterm)
             
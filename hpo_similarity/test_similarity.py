@@ -21,12 +21,48 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from __future__ import division
 
-import bisect
 import random
+from bisect import bisect_left
 
 from hpo_similarity.get_scores import get_proband_similarity
 
-def test_similarity(hpo_graph, hpo_by_proband, probands, n_sims, score_type="resnik"):
+def sample_probands(pool, size, n_sims, rng=random):
+    """ draw groups of probands at random, without replacement within groups
+    
+    Most genes only have a few probands, drawn from a pool of thousands. For
+    those, we pick random indices until we have enough distinct ones, which
+    is cheaper than calling random.sample() for every group. Large groups
+    fall back to random.sample(), as repeated indices become common.
+    
+    Args:
+        pool: list of items (e.g. HPO terms for each proband) to sample from
+        size: number of items to draw per group
+        n_sims: number of groups to draw
+        rng: random number generator to draw with, either a random.Random
+            object, or the random module itself.
+    
+    Returns:
+        iterator of lists of sampled items, one list per group
+    """
+    
+    total = len(pool)
+    if size * 4 > total:
+        return ( rng.sample(pool, size) for x in range(n_sims) )
+    
+    return ( _sample_indices(pool, size, total, rng.random) for x in range(n_sims) )
+
+def _sample_indices(pool, size, total, rand):
+    """ sample distinct items from a pool, by rejecting repeated indices
+    """
+    
+    chosen = set()
+    while len(chosen) < size:
+        chosen.add(int(rand() * total))
+    
+    return [ pool[i] for i in chosen ]
+
+def test_similarity(hpo_graph, hpo_by_proband, probands, n_sims, score_type="resnik",
+        pool=None, rng=random, nulls=None, stop_after=None):
     """ find if groups of probands per gene share HPO terms more than by chance.
     
     We simulate a distribution of similarity scores by randomly sampling groups
@@ -45,6 +81,23 @@ def test_similarity(hpo_graph, hpo_by_proband, probands, n_sims, score_type="res
         probands: list of proband IDs.
         n_sims: number of simulations to run.
         score_type: type of similarity metric to use ["resnik", "lin", "simGIC"]
+        pool: list of HPO terms for every proband, to sample from. This is
+            built from hpo_by_proband if not given, but when testing many
+            genes it is quicker to build it once and pass it in.
+        rng: random number generator to sample probands with. This defaults to
+            the random module, but a seeded random.Random object gives
+            reproducible P values.
+        nulls: optional dictionary of sorted simulated scores, indexed by the
+            number of probands. If given, genes with the same number of
+            probands share one set of simulations, rather than each gene
+            running its own. The dictionary is filled in as sizes are seen,
+            so it must only be shared between genes tested with the same
+            n_sims and score_type.
+        stop_after: optional number of simulated scores at least as high as
+            the observed score, after which we stop simulating. Genes which
+            are clearly not significant then stop early, with a P value of
+            stop_after divided by the number of simulations run (Besag and
+            Clifford, Biometrika (1991) 78:301-304).
     
     Returns:
         The probability that the HPO terms used in the probands match as well as
@@ -52,7 +105,6 @@ def test_similarity(hpo_graph, hpo_by_proband, probands, n_sims, score_type="res
     """
     
     probands = [hpo_by_proband[x] for x in probands if x in hpo_by_proband]
-    other_probands = [x for x in hpo_by_proband if x not in probands]
     
     # We can't test similarity from a single proband. We don't call this
     # function for genes with a single proband, however, sometimes only one of
@@ -63,21 +115,47 @@ def test_similarity(hpo_graph, hpo_by_proband, probands, n_sims, score_type="res
     
     observed = get_proband_similarity(hpo_graph, probands, score_type)
     
-    # get a distribution of scores for randomly sampled HPO terms
-    distribution = []
-    for x in range(n_sims):
-        sampled = random.sample(other_probands, len(probands))
-        simulated = [hpo_by_proband[n] for n in sampled]
-        predicted = get_proband_similarity(hpo_graph, simulated, score_type)
-        distribution.append(predicted)
-    
-    distribution = sorted(distribution)
+    # Similarity scores are never negative, so if the probands share nothing
+    # informative, every simulated score is at least as high as the observed
+    # score. We know the outcome without simulating, so skip the simulations.
+    if observed <= 0:
+        higher = n_sims
+    else:
+        # get a distribution of scores for randomly sampled probands. We sample
+        # the HPO term lists directly, rather than sampling proband IDs and
+        # then looking up their terms in every simulation.
+        if pool is None:
+            pool = list(hpo_by_proband.values())
+        
+        size = len(probands)
+        if nulls is None or size not in nulls:
+            distribution = ( get_proband_similarity(hpo_graph, sampled, score_type)
+                for sampled in sample_probands(pool, size, n_sims, rng) )
+        
+        if nulls is None:
+            # count how many simulated scores are at least as high as the
+            # observed score. This doesn't need the distribution to be sorted
+            # or kept.
+            if stop_after is None:
+                higher = sum(1 for score in distribution if score >= observed)
+            else:
+                # stop once enough simulated scores reach the observed score,
+                # as the gene can't be significant
+                higher = 0
+                for i, score in enumerate(distribution, start=1):
+                    if score >= observed:
+                        higher += 1
+                        if higher >= stop_after:
+                            return higher/i
+        else:
+            if size not in nulls:
+                nulls[size] = sorted(distribution)
+            
+            higher = n_sims - bisect_left(nulls[size], observed)
     
-    # figure out where in the distribution the observed value occurs
-    pos = bisect.bisect_left(distribution, observed)
-    sim_prob = (abs(pos - len(distribution)))/(1 + len(distribution))
+    sim_prob = higher/(1 + n_sims)
     
     if sim_prob == 0:
-        sim_prob = 1 / (1 + len(distribution))
+        sim_prob = 1 / (1 + n_sims)
     
     return sim_prob
@@ -0,0 +1,158 @@
+"""
+Copyright (c) 2015 Wellcome Trust Sanger Institute
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+from hpo_similarity.ontology import open_ontology
+from hpo_similarity.analyse_genes import analyse_genes
+
+class TestAnalyseGenesPy(unittest.TestCase):
+    """ class to test analysing genes for HPO similarity
+    """
+    
+    def setUp(self):
+        """ construct a ICSimilarity object and terms per proband for unit tests
+        """
+        
+        path = os.path.join(os.path.dirname(__file__), "data", "obo.txt")
+        self.hpo_graph, _, _ = open_ontology(path)
+        
+        self.hpo_terms = {
+            "person_01": ["HP:0000924"],
+            "person_02": ["HP:0000118", "HP:0002011"],
+            "person_03": ["HP:0000707", "HP:0002011"]
+        }
+        
+        self.hpo_graph.tally_hpo_terms(self.hpo_terms)
+        
+        self.genes = {"geneA": ["person_01"],
+            "geneB": ["person_02", "person_03"],
+            "geneC": ["person_01", "person_03"]}
+        
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "output.txt")
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def read_output(self):
+        """ load the gene P values from the output file
+        """
+        
+        with open(self.path) as handle:
+            header = handle.readline()
+            self.assertEqual(header, "hgnc\thpo_similarity_p_value\n")
+            return [ line.strip().split("\t") for line in handle ]
+    
+    def test_analyse_genes(self):
+        """ check that analyse_genes writes P values for genes with 2+ probands
+        """
+        
+        analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+            1000, "resnik")
+        
+        results = self.read_output()
+        self.assertEqual([ x[0] for x in results ], ["geneB", "geneC"])
+        self.assertLess(abs(float(results[1][1]) - 0.999), 0.03)
+    
+    def test_analyse_genes_processes(self):
+        """ check that analysing genes in parallel gives the same output genes
+        """
+        
+        analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+            1000, "resnik", processes=2)
+        
+        results = self.read_output()
+        self.assertEqual([ x[0] for x in results ], ["geneB", "geneC"])
+        self.assertLess(abs(float(results[1][1]) - 0.999), 0.03)
+    
+    def test_analyse_genes_stream(self):
+        """ check that analyse_genes writes to open streams, without closing them
+        """
+        
+        output = StringIO()
+        analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, output,
+            1000, "resnik")
+        
+        self.assertFalse(output.closed)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "hgnc\thpo_similarity_p_value")
+        self.assertEqual([ x.split("\t")[0] for x in lines[1:] ], ["geneB", "geneC"])
+    
+    def test_analyse_genes_seed(self):
+        """ check that seeded runs give the same P values across processes
+        """
+        
+        analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+            1000, "resnik", seed=1)
+        first = self.read_output()
+        
+        analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+            1000, "resnik", processes=2, seed=1)
+        self.assertEqual(self.read_output(), first)
+    
+    def test_analyse_genes_share_null(self):
+        """ check that seeded runs sharing simulations match across processes
+        """
+        
+        analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+            1000, "resnik", seed=1, share_null=True)
+        first = self.read_output()
+        self.assertEqual([ x[0] for x in first ], ["geneB", "geneC"])
+        
+        analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+            1000, "resnik", processes=2, seed=1, share_null=True)
+        self.assertEqual(self.read_output(), first)
+    
+    def test_analyse_genes_stop_after_errors(self):
+        """ check that invalid early stopping options raise errors
+        """
+        
+        # simulations shared across genes can't stop early for each gene
+        with self.assertRaises(ValueError):
+            analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+                1000, "resnik", share_null=True, stop_after=10)
+        
+        # we need at least one simulated score to reach the observed score
+        with self.assertRaises(ValueError):
+            analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+                1000, "resnik", stop_after=0)
+    
+    def test_analyse_genes_worker_error(self):
+        """ check that errors in worker processes stop the workers
+        """
+        
+        # an unknown score type raises an error within the workers. We keep
+        # the error, as its traceback keeps the pool from garbage collection.
+        error = None
+        try:
+            analyse_genes(self.hpo_graph, self.hpo_terms, self.genes, self.path,
+                1000, "unknown", processes=2)
+        except KeyError as err:
+            error = err
+        
+        self.assertIsNotNone(error)
+        self.assertEqual(multiprocessing.active_children(), [])
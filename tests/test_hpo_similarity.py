@@ -21,13 +21,14 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import os
 import math
+import random
 import unittest
 
 from hpo_similarity.ontology import open_ontology
 from hpo_similarity.similarity import ICSimilarity
 from hpo_similarity.get_scores import get_resnik_score, get_simGIC_score, \
-    get_proband_similarity
-from hpo_similarity.test_similarity import test_similarity
+    get_lin_score, get_proband_similarity, get_summed_resnik_score
+from hpo_similarity.test_similarity import test_similarity, sample_probands
 
 class TestHpoSimilarityPy(unittest.TestCase):
     """ class to test hpo similarity fucntions
@@ -66,6 +67,34 @@ class TestHpoSimilarityPy(unittest.TestCase):
         self.assertEqual(get_simGIC_score(self.hpo_graph, p1, p3), 0)
         self.assertEqual(get_simGIC_score(self.hpo_graph, p2, p3), 1)
     
+    def test_get_lin_score(self):
+        """ check that get_lin_score works correctly
+        """
+        
+        p1 = self.hpo_terms["person_01"]
+        p2 = self.hpo_terms["person_02"]
+        p3 = self.hpo_terms["person_03"]
+        
+        self.assertEqual(get_lin_score(self.hpo_graph, p1, p3), 0)
+        self.assertAlmostEqual(get_lin_score(self.hpo_graph, p2, p3), 1)
+        
+        # terms without any information content don't raise an error
+        self.assertEqual(get_lin_score(self.hpo_graph, ["HP:0000118"], ["HP:0000001"]), 0)
+    
+    def test_get_summed_resnik_score(self):
+        """ check that get_summed_resnik_score matches the pairwise scores
+        """
+        
+        probands = list(self.hpo_terms.values()) + [["HP:0000924", "HP:0000118"]]
+        
+        expected = 0
+        for x in range(len(probands)):
+            for y in range(x + 1, len(probands)):
+                expected += get_resnik_score(self.hpo_graph, probands[x], probands[y])
+        
+        self.assertEqual(get_summed_resnik_score(self.hpo_graph, probands), expected)
+        self.assertEqual(get_summed_resnik_score(self.hpo_graph, probands[:1]), 0)
+    
     def test_get_proband_similarity(self):
         """ check that get_proband_similarity works correctly
         """
@@ -81,6 +110,19 @@ class TestHpoSimilarityPy(unittest.TestCase):
         self.assertEqual(get_proband_similarity(self.hpo_graph, probands, "resnik"),
             -math.log(2/3.0) + -math.log(1/3.0))
         self.assertEqual(get_proband_similarity(self.hpo_graph, probands, "simGIC"), 3.0)
+        
+        # probands with identical terms (in any order) are scored as if each
+        # pair was scored separately
+        probands = [["HP:0000924", "HP:0000118"], ["HP:0002011"],
+            ["HP:0000118", "HP:0000924"], ["HP:0002011"], ["HP:0000924", "HP:0000118"]]
+        for score_type, get_score in [("lin", get_lin_score), ("simGIC", get_simGIC_score)]:
+            expected = 0
+            for x in range(len(probands)):
+                for y in range(x + 1, len(probands)):
+                    expected += get_score(self.hpo_graph, probands[x], probands[y])
+            
+            self.assertAlmostEqual(get_proband_similarity(self.hpo_graph,
+                probands, score_type), expected)
     
     def test_test_similarity(self):
         """ check that test_similarity works correctly
@@ -106,3 +148,66 @@ class TestHpoSimilarityPy(unittest.TestCase):
         p = test_similarity(self.hpo_graph, self.hpo_terms, probands, n_sims=1000, score_type="resnik")
         self.assertLess(abs(p - 0.999), 0.03)
         
+        # the observed score for those probands is zero, which no simulated
+        # score can fall below, so the P value is exact without sampling
+        self.assertEqual(test_similarity(self.hpo_graph, self.hpo_terms,
+            probands, n_sims=1000, score_type="resnik", rng=None), 1000/1001.0)
+        
+    
+    def test_test_similarity_shared_null(self):
+        """ check that test_similarity can share simulations across calls
+        """
+        
+        # use a seeded generator, so the P value is exact. 348 of the 1000
+        # simulations score as high as the observed score.
+        nulls = {}
+        probands = ["person_03", "person_03"]
+        p = test_similarity(self.hpo_graph, self.hpo_terms, probands,
+            n_sims=1000, score_type="resnik", rng=random.Random(1), nulls=nulls)
+        self.assertEqual(p, 348/1001.0)
+        
+        # the simulated scores are stored sorted, by the number of probands
+        self.assertEqual(list(nulls), [2])
+        self.assertEqual(len(nulls[2]), 1000)
+        self.assertEqual(nulls[2], sorted(nulls[2]))
+        
+        # later calls for the same number of probands reuse the simulations,
+        # so they don't need a random number generator
+        self.assertEqual(test_similarity(self.hpo_graph, self.hpo_terms,
+            probands, n_sims=1000, score_type="resnik", rng=None,
+            nulls=nulls), p)
+    
+    def test_test_similarity_stop_after(self):
+        """ check that test_similarity can stop simulating early
+        """
+        
+        # a third of simulations score as high as these probands, so ten
+        # simulations reach the observed score well before the thousandth
+        probands = ["person_03", "person_03"]
+        p = test_similarity(self.hpo_graph, self.hpo_terms, probands,
+            n_sims=1000, score_type="resnik", rng=random.Random(1), stop_after=10)
+        
+        # the P value is ten divided by the number of simulations run
+        self.assertLess(10/p, 1000)
+        self.assertAlmostEqual(10/p, round(10/p))
+        self.assertLess(abs(p - 0.33), 0.2)
+        
+        # if the limit is never reached, we use all the simulations
+        p = test_similarity(self.hpo_graph, self.hpo_terms, probands,
+            n_sims=1000, score_type="resnik", rng=random.Random(1), stop_after=1001)
+        self.assertAlmostEqual(p * 1001, round(p * 1001))
+        self.assertLess(abs(p - 0.33), 0.04)
+    
+    def test_sample_probands(self):
+        """ check that sample_probands draws distinct items for each group
+        """
+        
+        # check small groups from a large pool, and large groups from a small
+        # pool, which use different sampling approaches
+        for pool, size in [(list(range(100)), 3), (list(range(5)), 4)]:
+            groups = list(sample_probands(pool, size, 50))
+            self.assertEqual(len(groups), 50)
+            for group in groups:
+                self.assertEqual(len(group), size)
+                self.assertEqual(len(set(group)), size)
+                self.assertTrue(set(group) <= set(pool))
@@ -63,6 +63,28 @@ class TestICSimilarityPy(unittest.TestCase):
         # check the term/subterm count for a term that isn't used within any of
         # he probands, but which all of the used terms descend from.
         self.assertEqual(self.hpo_graph.get_term_count("HP:0000001"), 3)
+        
+        # counting doesn't add the subterm probands to the term's own probands
+        self.assertEqual(self.hpo_graph.get_ids_per_term("HP:0000118"),
+            set(["person_02"]))
+    
+    def test_cache_information_content(self):
+        """ check that cache_information_content matches per term calculations
+        """
+        
+        path = os.path.join(os.path.dirname(__file__), "data", "obo.txt")
+        graph, _, _ = open_ontology(path)
+        graph.tally_hpo_terms(self.hpo_terms)
+        graph.cache_information_content()
+        
+        for term in self.hpo_graph:
+            self.assertEqual(graph.get_term_count(term),
+                self.hpo_graph.get_term_count(term))
+            if graph.get_term_count(term) > 0:
+                self.assertAlmostEqual(graph.ic_cache[term],
+                    self.hpo_graph.calculate_information_content(term))
+            else:
+                self.assertNotIn(term, graph.ic_cache)
     
     def test_calculate_information_content(self):
         """ check that calculate_information_content works correctly
@@ -99,3 +121,84 @@ class TestICSimilarityPy(unittest.TestCase):
         # check the most informative information content for two identical nodes
         self.assertAlmostEqual(self.hpo_graph.get_most_informative_ic("HP:0000924", \
             "HP:0000924"), -math.log(1/3.0))
+    
+    def test_index_terms(self):
+        """ check that index_terms orders the terms by information content
+        """
+        
+        self.hpo_graph.index_terms()
+        self.assertEqual(set(self.hpo_graph.term_bits), set(self.hpo_graph.nodes()))
+        self.assertEqual(sorted(self.hpo_graph.term_bits.values()),
+            list(range(len(self.hpo_graph))))
+        
+        # the information content decreases with increasing bit position
+        ic = self.hpo_graph.ic_by_bit
+        self.assertEqual(ic, sorted(ic, reverse=True))
+        self.assertEqual(self.hpo_graph.term_bits["HP:0000924"], 0)
+    
+    def test_get_ancestor_mask(self):
+        """ check that get_ancestor_mask sets a bit for each ancestor
+        """
+        
+        mask = self.hpo_graph.get_ancestor_mask("HP:0002011")
+        bits = self.hpo_graph.term_bits
+        terms = set(x for x in bits if mask & (1 << bits[x]))
+        self.assertEqual(terms, self.hpo_graph.get_ancestors("HP:0002011"))
+        
+        # the proband mask is the union of the masks for its terms
+        proband = self.hpo_graph.get_proband_mask(["HP:0000924", "HP:0002011"])
+        self.assertEqual(proband, mask | self.hpo_graph.get_ancestor_mask("HP:0000924"))
+        self.assertEqual(self.hpo_graph.get_proband_mask([]), 0)
+        
+        # the term order doesn't matter, and the result is cached
+        self.hpo_graph.get_proband_mask(["HP:0002011", "HP:0000924"])
+        self.assertEqual(len(self.hpo_graph.proband_masks), 2)
+    
+    def test_get_mask_max_ic(self):
+        """ check that get_mask_max_ic finds the most informative term in a mask
+        """
+        
+        mask = self.hpo_graph.get_ancestor_mask("HP:0000707")
+        self.assertAlmostEqual(self.hpo_graph.get_mask_max_ic(mask), -math.log(2/3.0))
+        
+        mask = self.hpo_graph.get_ancestor_mask("HP:0000924")
+        self.assertAlmostEqual(self.hpo_graph.get_mask_max_ic(mask), -math.log(1/3.0))
+        
+        with self.assertRaises(ValueError):
+            self.hpo_graph.get_mask_max_ic(0)
+        
+        # terms without any information content raise errors, rather than
+        # returning None, e.g. if the terms haven't been tallied
+        graph, _, _ = open_ontology(os.path.join(os.path.dirname(__file__),
+            "data", "obo.txt"))
+        with self.assertRaises(ValueError):
+            graph.get_mask_max_ic(graph.get_ancestor_mask("HP:0000924"))
+        with self.assertRaises(ValueError):
+            graph.get_most_informative_ic("HP:0000924", "HP:0000707")
+    
+    def test_get_simgic(self):
+        """ check that get_simgic works correctly
+        """
+        
+        # terms on different arms only share ancestors with zero IC
+        self.assertEqual(self.hpo_graph.get_simgic("HP:0000924", "HP:0000707"), 0)
+        
+        # identical terms are completely similar
+        self.assertEqual(self.hpo_graph.get_simgic("HP:0002011", "HP:0002011"), 1)
+        
+        # a term and its parent, which share half of their summed IC
+        self.assertAlmostEqual(self.hpo_graph.get_simgic("HP:0000707", "HP:0002011"), 0.5)
+        
+        # the score is symmetric
+        self.assertAlmostEqual(self.hpo_graph.get_simgic("HP:0002011", "HP:0000707"), 0.5)
+    
+    def test_get_ancestor_ic_sum(self):
+        """ check that get_ancestor_ic_sum sums the IC of a term's ancestors
+        """
+        
+        ic = self.hpo_graph.calculate_information_content
+        self.assertAlmostEqual(self.hpo_graph.get_ancestor_ic_sum("HP:0002011"),
+            sum(ic(x) for x in self.hpo_graph.get_ancestors("HP:0002011")))
+        
+        # the root term has no IC, as every proband has a descendant term
+        self.assertEqual(self.hpo_graph.get_ancestor_ic_sum("HP:0000001"), 0)
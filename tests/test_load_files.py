@@ -0,0 +1,77 @@
+"""
+Copyright (c) 2015 Wellcome Trust Sanger Institute
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from hpo_similarity.load_files import load_participants_hpo_terms
+
+class TestLoadFilesPy(unittest.TestCase):
+    """ class to test loading phenotype and gene files
+    """
+    
+    def setUp(self):
+        """ write a phenotypes file for unit tests
+        """
+        
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "phenotypes.json")
+        
+        terms = {"person_01": ["HP:0000924", "HP:0000489"],
+            "person_02": ["HP:0001333", "HP:0002011"],
+            "person_03": ["HP:0002011", "HP:0000707", "HP:0001333", "HP:0002011"],
+            "person_04": ["", "HP:0000924"],
+            "person_05": [""],
+            "person_06": ["HP:0000489"]}
+        with open(self.path, "w") as handle:
+            json.dump(terms, handle)
+        
+        self.alt_ids = {"HP:0001333": "HP:0000707", "HP:0000489": "HP:0000478"}
+        self.obsolete = set(["HP:0000489"])
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_load_participants_hpo_terms(self):
+        """ check that obsolete terms are dropped, and alt IDs are converted
+        
+        Probands without any terms left (person_05 and person_06) are dropped.
+        """
+        
+        hpo = load_participants_hpo_terms(self.path, self.alt_ids, self.obsolete)
+        self.assertEqual(hpo, {"person_01": ["HP:0000924"],
+            "person_02": ["HP:0000707", "HP:0002011"],
+            "person_03": ["HP:0002011", "HP:0000707"],
+            "person_04": ["HP:0000924"]})
+    
+    def test_load_participants_hpo_terms_obsolete_alt_ids(self):
+        """ check that obsolete terms with alt IDs can be kept
+        """
+        
+        hpo = load_participants_hpo_terms(self.path, self.alt_ids,
+            self.obsolete, use_alt_id_if_hpo_term_obsolete=True)
+        self.assertEqual(hpo["person_01"], ["HP:0000924", "HP:0000478"])
+        
+        # the obsolete set passed in is left unchanged
+        self.assertEqual(self.obsolete, set(["HP:0000489"]))
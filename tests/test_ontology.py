@@ -20,12 +20,18 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import os
+import pickle
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 import networkx
 
 from hpo_similarity.ontology import (load_hpo_database, open_ontology,
-    track_alt_ids, add_hpo_attributes_to_node, is_obsolete, add_entry)
+    track_alt_ids, add_hpo_attributes_to_node, is_obsolete, add_entry,
+    get_cache_path)
+from hpo_similarity.similarity import ICSimilarity
 from hpo_similarity.obo import Stanza, Value
 
 # define the header that will be parsed from the test obo dataset
@@ -202,3 +208,98 @@ class TestOntologyPy(unittest.TestCase):
         # check that, as part of setting the graph up, we have constructed the
         # correct set of obsolete IDs
         self.assertEqual(obsolete, set(["HP:0000489"]))
+    
+    def test_add_entry(self):
+        """ check that add_entry collects nodes and edges for the graph
+        """
+        
+        nodes, edges, alt_ids, obsolete = [], [], {}, set()
+        for entry in HPO_LIST:
+            add_entry(nodes, edges, entry, alt_ids, obsolete)
+        
+        self.assertEqual([ x[0] for x in nodes ], ['HP:0000001', 'HP:0000118',
+            'HP:0000707', 'HP:0000924', 'HP:0002011'])
+        self.assertEqual(nodes[0][1]['name'], 'All')
+        self.assertEqual(edges, [('HP:0000001', 'HP:0000118'),
+            ('HP:0000118', 'HP:0000707'), ('HP:0000118', 'HP:0000924'),
+            ('HP:0000707', 'HP:0002011')])
+        self.assertEqual(obsolete, set(['HP:0000489']))
+        self.assertEqual(alt_ids['HP:0002405'], 'HP:0002011')
+    
+    def test_open_ontology_cache(self):
+        """ check that open_ontology can cache the parsed graph
+        """
+        
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cache_dir = os.path.join(temp_dir, "cache")
+            graph, alt_ids, obsolete = open_ontology(self.path, cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            # the second load reads the cached graph, which matches the first
+            cached, cached_alt_ids, cached_obsolete = open_ontology(self.path, cache_dir)
+            self.assertIsNot(cached, graph)
+            self.assertEqual(dict(cached.nodes(data=True)), dict(graph.nodes(data=True)))
+            self.assertEqual(set(cached.edges()), set(graph.edges()))
+            self.assertEqual(cached.graph, HEADER)
+            self.assertEqual(cached_alt_ids, alt_ids)
+            self.assertEqual(cached_obsolete, obsolete)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            # the cache holds the parsed data rather than the graph object, so
+            # the cache doesn't depend on the attributes of the graph class
+            cache_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(cache_path, "rb") as handle:
+                data = pickle.load(handle)
+            self.assertEqual(len(data), 5)
+            self.assertFalse(any(isinstance(x, ICSimilarity) for x in data))
+            
+            # the cache is readable by others, as a normally created file is
+            umask = os.umask(0)
+            os.umask(umask)
+            self.assertEqual(os.stat(cache_path).st_mode & 0o777, 0o666 & ~umask)
+        finally:
+            shutil.rmtree(temp_dir)
+    
+    def test_open_ontology_bad_cache(self):
+        """ check that open_ontology reparses the obo file if the cache is bad
+        """
+        
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # write a truncated cache file
+            cache_path = get_cache_path(self.path, temp_dir)
+            with open(cache_path, "wb") as handle:
+                handle.write(pickle.dumps(("a", "b"))[:5])
+            
+            graph, _, obsolete = open_ontology(self.path, temp_dir)
+            self.assertEqual(graph.graph, HEADER)
+            self.assertEqual(obsolete, set(["HP:0000489"]))
+            
+            # the unreadable cache is replaced with a working cache
+            with open(cache_path, "rb") as handle:
+                self.assertEqual(len(pickle.load(handle)), 5)
+        finally:
+            shutil.rmtree(temp_dir)
+    
+    def test_open_ontology_cache_write_error(self):
+        """ check that open_ontology carries on if the cache can't be written
+        """
+        
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # if the cache can't be moved into place, the temporary file is
+            # removed, and we still get the graph
+            with mock.patch("hpo_similarity.ontology.os.replace",
+                    side_effect=OSError("disk full")):
+                graph, _, _ = open_ontology(self.path, temp_dir)
+            self.assertEqual(graph.graph, HEADER)
+            self.assertEqual(os.listdir(temp_dir), [])
+            
+            # and likewise if the cache folder can't be made
+            path = os.path.join(temp_dir, "file")
+            open(path, "w").close()
+            graph, _, _ = open_ontology(self.path, path)
+            self.assertEqual(graph.graph, HEADER)
+        finally:
+            shutil.rmtree(temp_dir)
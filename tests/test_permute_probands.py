@@ -0,0 +1,64 @@
+"""
+Copyright (c) 2015 Wellcome Trust Sanger Institute
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import random
+import unittest
+
+from hpo_similarity.permute_probands import permute_probands
+
+class TestPermuteProbandsPy(unittest.TestCase):
+    """ class to test permuting probands across genes
+    """
+    
+    def test_permute_probands(self):
+        """ check that each gene gets as many probands, from other genes
+        """
+        
+        probands = {"geneA": ["DDD01", "DDD02"], "geneB": ["DDD03", "DDD04"],
+            "geneC": ["DDD05"], "geneD": ["DDD06", "DDD07", "DDD08"]}
+        everyone = set(["DDD0{0}".format(x) for x in range(1, 9)])
+        
+        for x in range(50):
+            permuted = permute_probands(probands)
+            self.assertEqual(set(permuted), set(probands))
+            for gene in probands:
+                sample = permuted[gene]
+                self.assertEqual(len(sample), len(probands[gene]))
+                self.assertEqual(len(set(sample)), len(sample))
+                self.assertTrue(set(sample) <= everyone - set(probands[gene]))
+    
+    def test_permute_probands_seeded(self):
+        """ check that permutations are reproducible with a seeded generator
+        """
+        
+        probands = {"geneA": ["DDD01", "DDD02"], "geneB": ["DDD03", "DDD04"],
+            "geneC": ["DDD05", "DDD06"]}
+        
+        first = permute_probands(probands, random.Random(1))
+        self.assertEqual(permute_probands(probands, random.Random(1)), first)
+    
+    def test_permute_probands_too_few(self):
+        """ check for an error when too few other probands exist to sample
+        """
+        
+        with self.assertRaises(ValueError):
+            permute_probands({"geneA": ["DDD01", "DDD02", "DDD03"],
+                "geneB": ["DDD04"]})
@@ -116,6 +116,17 @@ class TestCalculateSimilarityPy(unittest.TestCase):
         self.assertEqual(self.graph.get_descendants("HP:0000924"), \
             set([]))
     
+    def test_cache_descendants(self):
+        """ check that cache_descendants finds the descendants of every term
+        """
+        
+        self.graph.cache_descendants()
+        self.assertEqual(set(self.graph.descendant_cache), set(self.graph.nodes()))
+        self.assertEqual(self.graph.descendant_cache["HP:0000707"],
+            set(['HP:0002011']))
+        self.assertEqual(self.graph.descendant_cache["HP:0000001"],
+            set(self.graph.nodes()) - set(["HP:0000001"]))
+    
     def test_get_ancestors(self):
         """ check that get_ancestors works correctly
         """
@@ -146,3 +157,12 @@ class TestCalculateSimilarityPy(unittest.TestCase):
         # return an empty set
         self.assertEqual(self.graph.find_common_ancestors('HP:9999999', \
             'HP:0000707'), set([]))
+    
+    def test_cache_ancestors(self):
+        """ check that cache_ancestors finds the ancestors of every term
+        """
+        
+        self.graph.cache_ancestors()
+        self.assertEqual(set(self.graph.ancestor_cache), set(self.graph.nodes()))
+        self.assertEqual(self.graph.ancestor_cache["HP:0002011"],
+            set(['HP:0000001', 'HP:0000118', 'HP:0000707', 'HP:0002011']))